@@ -1,16 +1,47 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import zipfile
-import io
+import shutil
+import tempfile
+import numpy as np
 import pandas as pd
 import os
+import time
+import uuid
 from datetime import datetime
-from math import log, sqrt, exp
-from scipy.stats import norm
-from scipy.optimize import brentq
+from concurrent.futures import ThreadPoolExecutor
+from math import sqrt, exp
+from scipy.special import ndtr
+from scipy.optimize.elementwise import find_root
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
 import yfinance as yf
 
 SAVE_DIR = "."
+# 旧形式の出力。parquet がないときの初回移行の入力としてだけ読み、以後は更新しない
 OUTPUT_CSV = "daily_option_data.csv"
+# 出力先：日付ごとにパーティション分割した parquet データセット
+OUTPUT_DATASET = os.path.join(SAVE_DIR, "parquet")
+# 日付=YYYY-MM-DD/ のパーティション値は型推論させず文字列として扱う
+OUTPUT_PARTITIONING = ds.partitioning(pa.schema([("日付", pa.string())]), flavor="hive")
+
+OUTPUT_COLUMNS = [
+    "日付","銘柄","株価","限月",
+    "コールスト","コール終値","コール理論","コールIV",
+    "プットスト","プット終値","プット理論","プットIV",
+    "原資産IV"
+]
+# 日ごとのファイルでスキーマが揃うよう、書き込み前に型を固定する
+OUTPUT_DTYPES = {
+    col: (str if col in ("銘柄", "限月") else "float64")
+    for col in OUTPUT_COLUMNS if col != "日付"
+}
+
+# 日次キャッシュ（JPX から取得・抽出済みの行）
+CACHE_DIR = os.path.join(SAVE_DIR, "cache")
+CACHE_TTL_DAYS = 30
 
 
 TARGET_CODES = [
@@ -19,64 +50,144 @@ TARGET_CODES = [
     "5108","5401","5713","5802","6301","6501","6503","6594",
     "6702","6723","6752","6762"
 ]
+_TARGET_SET = frozenset(TARGET_CODES)
+# 対象外の銘柄は NaN になり、比較・groupby は整数コードで行われる
+_TARGET_DTYPE = pd.CategoricalDtype(categories=TARGET_CODES)
 
 ZIP_URL_TEMPLATE = "https://www.jpx.co.jp/markets/derivatives/option-price/data/ose{day}tp.zip"
 
+# ZIP を同時にダウンロードする最大数
+FETCH_WORKERS = 8
+
+# JPX へのダウンロードは 1 つのセッションで接続を使い回す（5xx は再試行）
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(
+    pool_connections=FETCH_WORKERS, pool_maxsize=FETCH_WORKERS,
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[500, 502, 503, 504])
+))
+
 
 # -------------------------
 # 株価を yfinance から取得（trade_date に対応）
 # -------------------------
-def get_stock_price_from_yf(code, trade_date):
+# yf.download の結果を (銘柄タプル, 期間) ごとに覚えておく（最大 64 件）
+_HISTORY_CACHE_SIZE = 64
+_history_cache = {}
+
+def _download_history(symbols, start, end):
     """
-    指定した trade_date 当日またはそれ以前で一番近い終値を返す。
+    yf.download の結果を (銘柄タプル, 期間) ごとにメモ化する。
+    yfinance は通信失敗でも例外を出さず空・全 NaN の表を返すため、それは覚えずに次回取り直す。
+    戻り値の DataFrame は共有されるので変更しないこと。
     """
-    try:
-        ticker = yf.Ticker(f"{code}.T")
+    key = (symbols, start, end)
+    if key in _history_cache:
+        return _history_cache[key]
+
+    hist = yf.download(
+        list(symbols), start=start, end=end, interval="1d",
+        group_by="ticker", auto_adjust=True, threads=True, progress=False
+    )
+    if hist is not None and not hist.dropna(how="all").empty:
+        if len(_history_cache) >= _HISTORY_CACHE_SIZE:
+            # 一番古いものから捨てる
+            del _history_cache[next(iter(_history_cache))]
+        _history_cache[key] = hist
+    return hist
+
+
+def get_stock_prices_from_yf(codes, trade_date):
+    """
+    複数銘柄をまとめて取得し、trade_date 当日またはそれ以前で一番近い終値を返す。
+    戻り値は {銘柄コード: 終値}。取得できなかった銘柄は含まない。
+    """
+    if not codes:
+        return {}
 
+    symbols = tuple(f"{code}.T" for code in codes)
+    try:
         start = trade_date - pd.Timedelta(days=10)
         end   = trade_date + pd.Timedelta(days=1)
 
-        hist = ticker.history(start=start, end=end, interval="1d")
-        if hist.empty:
-            return None
-
-        idx = hist.index.tz_localize(None) if hist.index.tz is not None else hist.index
-        hist = hist[idx <= trade_date]
+        hist = _download_history(symbols, start, end)
+    except Exception:
+        return {}
 
-        if hist.empty:
-            return None
+    if hist is None or hist.empty:
+        return {}
 
-        return float(hist["Close"].iloc[-1])
+    idx = hist.index.tz_localize(None) if hist.index.tz is not None else hist.index
+    hist = hist[idx <= trade_date]
 
-    except Exception:
-        return None
+    prices = {}
+    for code, symbol in zip(codes, symbols):
+        try:
+            close = hist[symbol]["Close"].dropna()
+        except KeyError:
+            continue
+        if not close.empty:
+            prices[code] = float(close.iloc[-1])
+    return prices
 
 
 # -------------------------
-# ブラックショールズ
+# ブラックショールズ（配列版）
 # -------------------------
-def bs_call_price(S, K, T, r, sigma):
-    if S <= 0 or K <= 0 or T <= 0 or sigma <= 0:
-        return None
-    d1 = (log(S/K) + (r + 0.5*sigma**2)*T) / (sigma*sqrt(T))
-    d2 = d1 - sigma*sqrt(T)
-    return S * norm.cdf(d1) - K * exp(-r*T) * norm.cdf(d2)
+# 理論価格・IV の前提（残存 30 日、金利 0）
+T_DEFAULT = 30 / 365
+R_DEFAULT = 0.0
+
+def _discount(r, T):
+    # r = 0 ならいつも 1 なので exp を省く
+    return 1.0 if r == 0 else exp(-r*T)
+
+def _bs_d1_d2(S, K, T, r, sigma):
+    S = np.asarray(S, dtype=np.float64)
+    K = np.asarray(K, dtype=np.float64)
+    sigma = np.asarray(sigma, dtype=np.float64)
+    valid = (S > 0) & (K > 0) & (sigma > 0) & (T > 0)
+    # T は全要素共通のスカラーなので sqrt(T) は 1 回だけ
+    sqrt_T = sqrt(T) if T > 0 else np.nan
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sig_sqrt_T = sigma*sqrt_T
+        d1 = (np.log(S/K) + (r + 0.5*sigma**2)*T) / sig_sqrt_T
+        d2 = d1 - sig_sqrt_T
+    return S, K, d1, d2, valid
+
+def bs_call_price_vec(S, K, T, r, sigma):
+    """
+    S, K, sigma を配列で受け取り、コール理論価格をまとめて計算する。
+    入力が不正な要素は NaN を返す。
+    """
+    S, K, d1, d2, valid = _bs_d1_d2(S, K, T, r, sigma)
+    with np.errstate(invalid="ignore"):
+        price = S * ndtr(d1) - K * _discount(r, T) * ndtr(d2)
+    return np.where(valid, price, np.nan)
 
-def bs_put_price(S, K, T, r, sigma):
-    if S <= 0 or K <= 0 or T <= 0 or sigma <= 0:
-        return None
-    d1 = (log(S/K) + (r + 0.5*sigma**2)*T) / (sigma*sqrt(T))
-    d2 = d1 - sigma*sqrt(T)
-    return K * exp(-r*T) * norm.cdf(-d2) - S * norm.cdf(-d1)
+def bs_put_price_vec(S, K, T, r, sigma):
+    """
+    S, K, sigma を配列で受け取り、プット理論価格をまとめて計算する。
+    入力が不正な要素は NaN を返す。
+    """
+    S, K, d1, d2, valid = _bs_d1_d2(S, K, T, r, sigma)
+    with np.errstate(invalid="ignore"):
+        price = K * _discount(r, T) * ndtr(-d2) - S * ndtr(-d1)
+    return np.where(valid, price, np.nan)
 
 def implied_vol_put(S, K, T, r, market_price):
-    try:
-        return brentq(
-            lambda sigma: bs_put_price(S, K, T, r, sigma) - market_price,
-            0.0001, 3.0
-        )
-    except Exception:
-        return None
+    """
+    プットIVを全銘柄まとめて求める（Chandrupatla 法、配列版）。
+    収束しない・解が区間 [0.0001, 3.0] にない要素は NaN を返す。
+    """
+    S = np.asarray(S, dtype=np.float64)
+    K = np.asarray(K, dtype=np.float64)
+    market_price = np.asarray(market_price, dtype=np.float64)
+
+    def f(sigma, S, K, market_price):
+        return bs_put_price_vec(S, K, T, r, sigma) - market_price
+
+    res = find_root(f, (0.0001, 3.0), args=(S, K, market_price))
+    return np.where(res.success, res.x, np.nan)
 # JPX CSV の 17 列ヘッダー
 HEADER_ROW = [
     "商品コード","商品タイプ","限月","権利行使価格","理論価格","清算価格",
@@ -85,23 +196,71 @@ HEADER_ROW = [
     "追加列1","追加列2"
 ]
 
+# 実際に使う列だけ読む（コード系は文字列のまま、数値系は C パーサで float 化）
+JPX_STR_COLUMNS = ["商品コード", "限月"]
+JPX_NUMERIC_COLUMNS = [
+    "権利行使価格", "コール終値", "コールIV", "プット終値", "原資産終値", "基準IV"
+]
+
 def read_jpx_csv(csv_file):
-    df = pd.read_csv(csv_file, encoding="shift_jis", header=None, names=HEADER_ROW)
-    df["商品コード4桁"] = df["商品コード"].astype(str).str[:4]
+    df = pd.read_csv(
+        csv_file, encoding="shift_jis", header=None, names=HEADER_ROW,
+        usecols=JPX_STR_COLUMNS + JPX_NUMERIC_COLUMNS,
+        dtype={col: str for col in JPX_STR_COLUMNS},
+        engine="c"
+    )
+    # 対象外のコードはカテゴリに入れると pandas が警告（将来は例外）を出すので NaN にしてから変換する
+    code4 = df["商品コード"].str.slice(0, 4)
+    df["商品コード4桁"] = code4.where(code4.isin(_TARGET_SET)).astype(_TARGET_DTYPE)
     return df
 
 
-def process_one_day(csv_file, trade_date_str):
-    df = read_jpx_csv(csv_file)
-    if df is None:
-        return []
+def nearest_positions(sorted_values, targets):
+    """
+    昇順ソート済みの sorted_values の中で、各 target に最も近い要素の位置を返す。
+    距離が同じ場合は小さい方、同じ値が複数あれば先頭を選ぶ。
+    """
+    targets = np.asarray(targets, dtype=np.float64)
+    if len(sorted_values) == 1:
+        return np.zeros(len(targets), dtype=np.intp)
 
-    records = []
+    pos = np.clip(np.searchsorted(sorted_values, targets), 1, len(sorted_values) - 1)
+    left  = sorted_values[pos - 1]
+    right = sorted_values[pos]
+    nearest = np.where(targets - left <= right - targets, left, right)
+    return np.searchsorted(sorted_values, nearest, side="left")
+
+
+def extract_target_rows(df):
+    """
+    JPX の全行から対象銘柄の行だけを取り出し、型変換もここで一度だけ行う。
+    戻り値は日次キャッシュにそのまま保存される。
+    """
+    df = df[df["商品コード4桁"].isin(_TARGET_SET)].copy()
+    for col in JPX_NUMERIC_COLUMNS:
+        # 数値以外が混ざっていた列だけ実際に変換が走る
+        if df[col].dtype != np.float64:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+    df["限月"] = df["限月"].str.strip()
+    return df
+
+
+def process_target_rows(df, trade_date_str):
+    rows = []
     trade_date = datetime.strptime(trade_date_str, "%Y-%m-%d")
 
+    T = T_DEFAULT
+    r = R_DEFAULT
+
+    # 翌月限・権利行使価格ありの行だけに一度で絞ってから銘柄ごとに分ける
+    next_month = (trade_date + pd.DateOffset(months=1)).strftime("%Y%m")
+    df = df[(df["限月"] == next_month) & df["権利行使価格"].notna()]
+    groups = dict(iter(df.groupby("商品コード4桁", sort=False, observed=True)))
+
+    candidates = []
     for code in TARGET_CODES:
-        df_code = df[df["商品コード4桁"] == code]
-        if df_code.empty:
+        df_code = groups.get(code)
+        if df_code is None or df_code.empty:
             continue
 
         # -------------------------
@@ -113,28 +272,29 @@ def process_one_day(csv_file, trade_date_str):
         except:
             spot = None
 
-        if spot is None or spot <= 0:
-            spot = get_stock_price_from_yf(code, trade_date)
+        candidates.append((code, df_code, spot))
 
-        if spot is None or spot <= 0:
+    # JPX に株価がない銘柄は yfinance からまとめて取得
+    # （空欄は NaN で読まれるので、NaN も「株価なし」として扱う）
+    missing_codes = [code for code, _, spot in candidates if spot is None or not spot > 0]
+    yf_prices = get_stock_prices_from_yf(missing_codes, trade_date)
+
+    for code, df_code, spot in candidates:
+        if spot is None or not spot > 0:
+            spot = yf_prices.get(code)
+
+        if spot is None or not spot > 0:
             continue
 
         call_target = spot * 1.05
         put_target  = spot * 0.95
 
-        next_month = (trade_date + pd.DateOffset(months=1)).strftime("%Y%m")
-        df_m = df_code[df_code["限月"].astype(str).str.strip() == next_month]
-        if df_m.empty:
-            continue
+        strikes = df_code["権利行使価格"].to_numpy()
+        order = np.argsort(strikes, kind="stable")
+        call_pos, put_pos = nearest_positions(strikes[order], [call_target, put_target])
 
-        df_m = df_m.copy()
-        df_m["権利行使価格"] = pd.to_numeric(df_m["権利行使価格"], errors="coerce")
-        df_m = df_m.dropna(subset=["権利行使価格"])
-        if df_m.empty:
-            continue
-
-        call_row = df_m.iloc[(df_m["権利行使価格"] - call_target).abs().argmin()]
-        put_row  = df_m.iloc[(df_m["権利行使価格"] - put_target).abs().argmin()]
+        call_row = df_code.iloc[order[call_pos]]
+        put_row  = df_code.iloc[order[put_pos]]
 
         call_strike = float(call_row["権利行使価格"])
         put_strike  = float(put_row["権利行使価格"])
@@ -159,71 +319,189 @@ def process_one_day(csv_file, trade_date_str):
 
         asset_iv = call_row.get("基準IV", None)
 
-        T = 30 / 365
-        r = 0.0
-
-        call_theo = None
-        put_theo  = None
-        if sigma_call is not None:
-            try:
-                call_theo = bs_call_price(spot, call_strike, T, r, sigma_call)
-                put_theo  = bs_put_price(spot, put_strike, T, r, sigma_call)
-            except:
-                pass
-
-        put_iv = None
+        put_mkt = np.nan
         try:
             if put_price is not None and float(put_price) > 0:
-                put_iv = implied_vol_put(
-                    S=spot, K=put_strike, T=T, r=r, market_price=float(put_price)
-                )
+                put_mkt = float(put_price)
         except:
-            put_iv = None
+            put_mkt = np.nan
+
+        rows.append([
+            code, spot, call_strike, call_price, sigma_call,
+            put_strike, put_price, put_mkt, asset_iv
+        ])
+
+    if not rows:
+        return []
+
+    # -------------------------
+    # 理論価格・プットIV：当日分をまとめて配列で計算
+    # -------------------------
+    S_arr     = np.asarray([row[1] for row in rows], dtype=np.float64)
+    K_call    = np.asarray([row[2] for row in rows], dtype=np.float64)
+    K_put     = np.asarray([row[5] for row in rows], dtype=np.float64)
+    sigma_arr = np.asarray(
+        [np.nan if row[4] is None else row[4] for row in rows], dtype=np.float64
+    )
+
+    call_theo = bs_call_price_vec(S_arr, K_call, T, r, sigma_arr)
+    put_theo  = bs_put_price_vec(S_arr, K_put, T, r, sigma_arr)
 
+    put_mkt_arr = np.asarray([row[7] for row in rows], dtype=np.float64)
+    put_iv = implied_vol_put(S_arr, K_put, T, r, put_mkt_arr)
+
+    records = []
+    for i, (code, spot, call_strike, call_price, sigma_call,
+            put_strike, put_price, _, asset_iv) in enumerate(rows):
         records.append([
             trade_date_str, code, spot, next_month,
-            call_strike, call_price, call_theo, sigma_call,
-            put_strike, put_price, put_theo, put_iv,
+            call_strike, call_price, float(call_theo[i]), sigma_call,
+            put_strike, put_price, float(put_theo[i]), float(put_iv[i]),
             asset_iv
         ])
 
     return records
-def fetch_and_process_day(trade_date):
-    day_str = trade_date.strftime("%Y%m%d")
-    trade_date_str = trade_date.strftime("%Y-%m-%d")
-    url = ZIP_URL_TEMPLATE.format(day=day_str)
-    print(f"[取得] {trade_date_str} → {url}")
+def zip_url(trade_date):
+    return ZIP_URL_TEMPLATE.format(day=trade_date.strftime("%Y%m%d"))
+
 
+def fetch_day_zip(trade_date):
+    """
+    JPX の日次 ZIP をストリーミングで一時ファイルにダウンロードする。
+    戻り値は (先頭に seek 済みの一時ファイル, None)、取得できなかった場合は
+    (None, エラー内容)。一時ファイルは呼び出し側で close する。
+    スレッドから並列に呼ばれるため、ここでは print せずログは呼び出し側で出す。
+    """
     try:
-        resp = requests.get(url)
-        if resp.status_code != 200:
-            print(f"  -> ZIP取得失敗 (status={resp.status_code})")
-            return []
+        with _session.get(zip_url(trade_date), timeout=30, stream=True) as resp:
+            if resp.status_code != 200:
+                return None, f"ZIP取得失敗 (status={resp.status_code})"
+
+            resp.raw.decode_content = True
+            # 3.10 の SpooledTemporaryFile は seekable() がなく zipfile で読めない
+            tmp = tempfile.TemporaryFile()
+            try:
+                shutil.copyfileobj(resp.raw, tmp)
+            except Exception:
+                tmp.close()
+                raise
 
-        with zipfile.ZipFile(io.BytesIO(resp.content)) as z:
+        tmp.seek(0)
+        return tmp, None
+
+    except Exception as e:
+        return None, f"エラー: {e}"
+
+
+def read_day_zip(zip_file, trade_date):
+    """
+    ZIP 内の CSV を読み、対象銘柄の行（extract_target_rows の結果）を返す。
+    読めなかった場合は None。zip_file は読み終わったら閉じる。
+    """
+    trade_date_str = trade_date.strftime("%Y-%m-%d")
+
+    try:
+        with zip_file, zipfile.ZipFile(zip_file) as z:
             csv_name = [n for n in z.namelist() if n.endswith(".csv")][0]
             with z.open(csv_name) as f:
-                return process_one_day(f, trade_date_str)
+                return extract_target_rows(read_jpx_csv(f))
+
+    except Exception as e:
+        print(f"  -> {trade_date_str}: エラー: {e}")
+        return None
+
+
+def process_day(df_day, trade_date):
+    trade_date_str = trade_date.strftime("%Y-%m-%d")
+
+    try:
+        return process_target_rows(df_day, trade_date_str)
 
     except Exception as e:
-        print(f"  -> エラー: {e}")
+        print(f"  -> {trade_date_str}: エラー: {e}")
         return []
 
 
-def main():
+# -------------------------
+# 日次キャッシュ（対象銘柄の JPX 行を trade_date ごとに parquet で保存）
+# -------------------------
+def _cache_path(trade_date):
+    return os.path.join(CACHE_DIR, f"{trade_date:%Y%m%d}.parquet")
+
+def load_cached_day(trade_date):
+    """キャッシュがあり TTL 内なら DataFrame を返す。なければ None。"""
+    path = _cache_path(trade_date)
+    if not os.path.exists(path):
+        return None
+    if time.time() - os.path.getmtime(path) > CACHE_TTL_DAYS * 24 * 60 * 60:
+        return None
+    try:
+        return pd.read_parquet(path)
+    except Exception:
+        return None
+
+def save_cached_day(trade_date, df_day):
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        df_day.to_parquet(_cache_path(trade_date), index=False)
+    except Exception as e:
+        print(f"  -> キャッシュ保存失敗: {e}")
+
+
+def load_fetched_day(fetched, trade_date):
+    """
+    fetch_day_zip の結果を読み、読めた場合は日次キャッシュにも保存する。
+    取得・読み込みに失敗していれば None。ログはメインスレッドから日付順に出す。
+    """
+    trade_date_str = trade_date.strftime("%Y-%m-%d")
+    print(f"[取得] {trade_date_str} → {zip_url(trade_date)}")
+
+    zip_file, error = fetched
+    if zip_file is None:
+        print(f"  -> {trade_date_str}: {error}")
+        return None
+    df_day = read_day_zip(zip_file, trade_date)
+    if df_day is not None:
+        save_cached_day(trade_date, df_day)
+    return df_day
+
+
+# -------------------------
+# 出力（parquet データセット）
+# -------------------------
+def append_to_dataset(df_new):
+    """新しい日のレコードだけを 日付=YYYY-MM-DD/ 以下に追記する。"""
+    df_new = df_new.astype(OUTPUT_DTYPES).sort_values(["日付","銘柄"])
+    table = pa.Table.from_pandas(df_new, preserve_index=False)
+    ds.write_dataset(
+        table, base_dir=OUTPUT_DATASET, format="parquet",
+        partitioning=OUTPUT_PARTITIONING,
+        # 既存の日のファイルには触れず、書き込みごとに別名のファイルを作る
+        existing_data_behavior="overwrite_or_ignore",
+        basename_template=f"{uuid.uuid4().hex}-{{i}}.parquet"
+    )
+
+
+def load_existing_dates():
+    if os.path.exists(OUTPUT_DATASET):
+        dates = pq.read_table(
+            OUTPUT_DATASET, columns=["日付"], partitioning=OUTPUT_PARTITIONING
+        ).column("日付").to_pylist()
+        print(f"既存データ読み込み: {OUTPUT_DATASET}（{len(dates)}行）")
+        return set(dates)
+
     if os.path.exists(OUTPUT_CSV):
-        df_csv = pd.read_csv(OUTPUT_CSV)
-        existing_dates = set(df_csv["日付"].astype(str).tolist())
-        print(f"既存CSV読み込み: {OUTPUT_CSV}（{len(df_csv)}行）")
-    else:
-        df_csv = pd.DataFrame(columns=[
-            "日付","銘柄","株価","限月",
-            "コールスト","コール終値","コール理論","コールIV",
-            "プットスト","プット終値","プット理論","プットIV",
-            "原資産IV"
-        ])
-        existing_dates = set()
-        print(f"新規CSVとして作成予定: {OUTPUT_CSV}")
+        df_csv = pd.read_csv(OUTPUT_CSV, dtype={"銘柄": str, "限月": str})
+        append_to_dataset(df_csv)
+        print(f"既存CSVを parquet に移行: {OUTPUT_CSV} → {OUTPUT_DATASET}（{len(df_csv)}行）")
+        return set(df_csv["日付"].astype(str).tolist())
+
+    print(f"新規データセットとして作成予定: {OUTPUT_DATASET}")
+    return set()
+
+
+def main():
+    existing_dates = load_existing_dates()
 
     start_date = datetime(2025, 10, 8)
     today = datetime.today()
@@ -237,27 +515,31 @@ def main():
     print(f"=== 欠損日: {len(missing_days)}件 ===")
     all_records = []
 
-    for d in missing_days:
-        recs = fetch_and_process_day(d)
-        if recs:
-            print(f"  -> {d.strftime('%Y-%m-%d')}: {len(recs)}件")
-            all_records.extend(recs)
-        else:
-            print(f"  -> {d.strftime('%Y-%m-%d')}: データなし or 抽出0件")
+    # キャッシュ済みの日はダウンロードしない
+    cached = {d: load_cached_day(d) for d in missing_days}
+    to_fetch = [d for d in missing_days if cached[d] is None]
+    print(f"    キャッシュ利用: {len(missing_days) - len(to_fetch)}件")
+
+    # ダウンロードはスレッドで並列、CSV の処理は取得順にメインスレッドで
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as executor:
+        zip_files = executor.map(fetch_day_zip, to_fetch)
+        for d in missing_days:
+            df_day = cached[d]
+            if df_day is None:
+                df_day = load_fetched_day(next(zip_files), d)
+
+            recs = process_day(df_day, d) if df_day is not None else []
+            if recs:
+                print(f"  -> {d.strftime('%Y-%m-%d')}: {len(recs)}件")
+                all_records.extend(recs)
+            else:
+                print(f"  -> {d.strftime('%Y-%m-%d')}: データなし or 抽出0件")
 
     if all_records:
-        df_new = pd.DataFrame(all_records, columns=[
-            "日付","銘柄","株価","限月",
-            "コールスト","コール終値","コール理論","コールIV",
-            "プットスト","プット終値","プット理論","プットIV",
-            "原資産IV"
-        ])
-
-        df_all = pd.concat([df_csv, df_new], ignore_index=True)
-        df_all = df_all.sort_values(["日付","銘柄"])
-        df_all.to_csv(OUTPUT_CSV, index=False, encoding="utf-8-sig")
+        df_new = pd.DataFrame(all_records, columns=OUTPUT_COLUMNS)
+        append_to_dataset(df_new)
 
-        print(f"✅ 保存完了: {OUTPUT_CSV}（合計 {len(df_all)} 行）")
+        print(f"✅ 保存完了: {OUTPUT_DATASET}（追加 {len(df_new)} 行）")
     else:
         print("⚠️ 新規レコードなし（全日データなし or 既存と重複）")
 
@@ -1,11 +1,14 @@
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
+import plotly.graph_objects as go
+import pyarrow.parquet as pq
 import yfinance as yf
-import subprocess
+import io
+import os
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
 
-# 日本語フォント（Windows用）
-plt.rcParams['font.family'] = 'MS Gothic'
+import TargetBuyPBR
 
 # 銘柄コード → 銘柄名 対応表
 code_to_name = {
@@ -18,8 +21,44 @@ code_to_name = {
     "6702": "富士通", "6723": "ルネサス", "6752": "パナソニック", "6762": "TDK"
 }
 
-# CSVパス
-csv_path = "daily_option_data.csv"
+# ---------------------------------------------------------
+# yfinance キャッシュ
+# ---------------------------------------------------------
+@st.cache_data(ttl=3600)
+def get_infos(codes):
+    """銘柄ごとの info を並列に取得し、1時間キャッシュする。"""
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        return dict(zip(codes, executor.map(lambda c: yf.Ticker(f"{c}.T").info, codes)))
+
+# ---------------------------------------------------------
+# データ読み込み（同じ条件ならキャッシュを返す）
+# ---------------------------------------------------------
+def _read_dataset(columns, filters=None):
+    table = pq.read_table(
+        TargetBuyPBR.OUTPUT_DATASET, columns=columns, filters=filters,
+        partitioning=TargetBuyPBR.OUTPUT_PARTITIONING
+    )
+    df = table.to_pandas()
+    # 日付は一度だけ datetime に変換しておく
+    df["日付"] = pd.to_datetime(df["日付"])
+    return df.sort_values(["銘柄","日付"], ignore_index=True)
+
+@st.cache_data
+def load_summary():
+    """最新一覧と銘柄・日付範囲の選択に使う列だけを読む。"""
+    return _read_dataset(["日付","銘柄","原資産IV"])
+
+@st.cache_data
+def load_code_range(code, start_date, end_date):
+    """
+    選択した銘柄・日付範囲の行だけを読む。
+    範囲外の日付パーティションはファイルごと読み飛ばされる。
+    """
+    return _read_dataset(TargetBuyPBR.OUTPUT_COLUMNS, filters=[
+        ("銘柄", "=", code),
+        ("日付", ">=", str(start_date)),
+        ("日付", "<=", str(end_date)),
+    ])
 
 # ---------------------------------------------------------
 # 🔘 今すぐ更新ボタン（TargetBuyPBR.py 実行）
@@ -28,18 +67,34 @@ st.markdown("## 📥 データ更新")
 
 if st.button("📥 今すぐデータ更新（TargetBuyPBR.py 実行）"):
     with st.spinner("TargetBuyPBR.py を実行中…"):
-        result = subprocess.run(
-            ["python", r"C:\temp\option\TargetBuy\TargetBuyPBR.py"],
-            capture_output=True, text=True
-        )
-        st.success("✅ データ更新完了")
-        st.text(result.stdout)
-        st.text(result.stderr)
+        # 別プロセスを起動せず、同じプロセス内で main() を呼んでログだけ受け取る
+        log = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+                TargetBuyPBR.main()
+            st.success("✅ データ更新完了")
+            st.text(log.getvalue())
+        except Exception as e:
+            # 途中で失敗しても画面は落とさず、そこまでのログとエラーを表示する
+            st.error("❌ データ更新に失敗しました")
+            st.text(log.getvalue())
+            st.exception(e)
+        finally:
+            # 途中まで書き込まれたデータも読み直せるようにする
+            load_summary.clear()
+            load_code_range.clear()
 
 # ---------------------------------------------------------
-# CSV読み込み
+# データ読み込み
 # ---------------------------------------------------------
-df = pd.read_csv(csv_path)
+# 初回（parquet がまだない）は同梱の CSV を parquet に移行してから読む
+if not os.path.exists(TargetBuyPBR.OUTPUT_DATASET):
+    TargetBuyPBR.load_existing_dates()
+if not os.path.exists(TargetBuyPBR.OUTPUT_DATASET):
+    st.warning("データがありません。「今すぐデータ更新」を実行してください。")
+    st.stop()
+
+df = load_summary()
 codes = sorted(df["銘柄"].unique())
 
 st.markdown("## 📊 オプション価格比較ダッシュボード（スマホ最適化版）")
@@ -49,13 +104,13 @@ st.markdown("## 📊 オプション価格比較ダッシュボード（スマ
 # ---------------------------------------------------------
 st.subheader("📊 最新一覧")
 
+infos = get_infos(tuple(codes))
+
 latest_rows = []
 for code in codes:
-    df_code = df[df["銘柄"] == code].sort_values("日付")
-    latest = df_code.iloc[-1]
+    latest = df[df["銘柄"] == code].iloc[-1]
 
-    ticker = yf.Ticker(f"{code}.T")
-    info = ticker.info
+    info = infos[code]
 
     latest_rows.append({
         "銘柄": code,
@@ -96,23 +151,24 @@ code = st.selectbox(
     format_func=lambda x: f"{x}：{code_to_name.get(str(x), '不明')}"
 )
 
-df_code = df[df["銘柄"] == code].sort_values("日付")
+df_code = df[df["銘柄"] == code]
 
-min_date = pd.to_datetime(df_code["日付"].min())
-max_date = pd.to_datetime(df_code["日付"].max())
+min_date = df_code["日付"].min()
+max_date = df_code["日付"].max()
 
 start_date, end_date = st.date_input(
     "表示する日付範囲を選択",
     [min_date, max_date]
 )
 
-df_filtered = df_code[
-    (pd.to_datetime(df_code["日付"]) >= pd.to_datetime(start_date)) &
-    (pd.to_datetime(df_code["日付"]) <= pd.to_datetime(end_date))
-]
+df_filtered = load_code_range(code, start_date, end_date)
 
 st.write("### データ一覧（最新順）")
-st.dataframe(df_filtered.sort_values("日付", ascending=False), use_container_width=True)
+st.dataframe(
+    df_filtered.sort_values("日付", ascending=False),
+    column_config={"日付": st.column_config.DateColumn("日付")},
+    use_container_width=True
+)
 
 # ---------------------------------------------------------
 # 📈 グラフ表示（スマホ対応）
@@ -120,49 +176,50 @@ st.dataframe(df_filtered.sort_values("日付", ascending=False), use_container_w
 st.subheader("📈 グラフ表示")
 
 if st.button("📈 グラフを表示"):
-    fig, ax1 = plt.subplots(figsize=(10, 5))
-
-    ax1.plot(df_filtered["日付"], df_filtered["コール終値"], label="コール終値", color="red")
-    ax1.plot(df_filtered["日付"], df_filtered["コール理論"], label="コール理論", color="orange", linestyle="--")
-    ax1.set_xlabel("日付")
-    ax1.set_ylabel("コール価格", color="red")
-    plt.xticks(rotation=45)
-
-    ax2 = ax1.twinx()
-    ax2.plot(df_filtered["日付"], df_filtered["プット終値"], label="プット終値", color="blue")
-    ax2.plot(df_filtered["日付"], df_filtered["プット理論"], label="プット理論", color="cyan", linestyle="--")
-    ax2.set_ylabel("プット価格", color="blue")
-
-    ax3 = ax1.twinx()
-    ax3.spines["right"].set_position(("outward", 60))
-    ax3.plot(df_filtered["日付"], df_filtered["株価"], label="株価", color="black", linewidth=3)
-    ax3.set_ylabel("株価", color="black")
-
-    lines, labels = [], []
-    for ax in [ax1, ax2, ax3]:
-        line, label = ax.get_legend_handles_labels()
-        lines += line
-        labels += label
-
-    fig.legend(lines, labels, loc="upper left", bbox_to_anchor=(0.1, 0.9))
-    plt.title(f"{code}：{code_to_name.get(str(code), '不明')} オプション価格＋株価推移")
-    st.pyplot(fig)
+    x = df_filtered["日付"]
+    fig = go.Figure()
+
+    fig.add_trace(go.Scatter(x=x, y=df_filtered["コール終値"], name="コール終値",
+                             line=dict(color="red")))
+    fig.add_trace(go.Scatter(x=x, y=df_filtered["コール理論"], name="コール理論",
+                             line=dict(color="orange", dash="dash")))
+    fig.add_trace(go.Scatter(x=x, y=df_filtered["プット終値"], name="プット終値",
+                             line=dict(color="blue"), yaxis="y2"))
+    fig.add_trace(go.Scatter(x=x, y=df_filtered["プット理論"], name="プット理論",
+                             line=dict(color="cyan", dash="dash"), yaxis="y2"))
+    fig.add_trace(go.Scatter(x=x, y=df_filtered["株価"], name="株価",
+                             line=dict(color="black", width=3), yaxis="y3"))
+
+    fig.update_layout(
+        title=f"{code}：{code_to_name.get(str(code), '不明')} オプション価格＋株価推移",
+        xaxis=dict(title="日付", domain=[0, 0.88], tickangle=45),
+        yaxis=dict(title=dict(text="コール価格", font=dict(color="red"))),
+        yaxis2=dict(title=dict(text="プット価格", font=dict(color="blue")),
+                    overlaying="y", side="right"),
+        yaxis3=dict(title=dict(text="株価", font=dict(color="black")),
+                    overlaying="y", side="right", anchor="free", position=1.0),
+        legend=dict(x=0.01, y=0.99),
+    )
+    st.plotly_chart(fig, use_container_width=True)
 
 # ---------------------------------------------------------
 # 📉 IVグラフ（スマホ対応）
 # ---------------------------------------------------------
 if st.checkbox("IVの推移も表示する"):
-    fig2, ax = plt.subplots(figsize=(10, 4))
-
-    ax.plot(df_filtered["日付"], df_filtered["コールIV"], label="コールIV", color="red")
-    ax.plot(df_filtered["日付"], df_filtered["プットIV"], label="プットIV", color="blue")
-    ax.plot(df_filtered["日付"], df_filtered["原資産IV"], label="原資産IV", color="gray", linestyle="--")
-
-    ax.set_title(f"{code}：{code_to_name.get(str(code), '不明')} IVの推移")
-    ax.set_xlabel("日付")
-    ax.set_ylabel("IV")
-    plt.xticks(rotation=45)
-    ax.legend()
-
-    st.pyplot(fig2)
+    x = df_filtered["日付"]
+    fig2 = go.Figure()
+
+    fig2.add_trace(go.Scatter(x=x, y=df_filtered["コールIV"], name="コールIV",
+                              line=dict(color="red")))
+    fig2.add_trace(go.Scatter(x=x, y=df_filtered["プットIV"], name="プットIV",
+                              line=dict(color="blue")))
+    fig2.add_trace(go.Scatter(x=x, y=df_filtered["原資産IV"], name="原資産IV",
+                              line=dict(color="gray", dash="dash")))
+
+    fig2.update_layout(
+        title=f"{code}：{code_to_name.get(str(code), '不明')} IVの推移",
+        xaxis=dict(title="日付", tickangle=45),
+        yaxis=dict(title="IV"),
+    )
+    st.plotly_chart(fig2, use_container_width=True)
 
@@ -0,0 +1,230 @@
+import csv
+import io
+import zipfile
+from math import exp, log, sqrt
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.optimize import brentq
+from scipy.stats import norm
+
+import TargetBuyPBR
+
+
+def _jpx_csv_bytes(rows):
+    buf = io.StringIO()
+    csv.writer(buf).writerows(rows)
+    return buf.getvalue().encode("shift_jis")
+
+
+def _jpx_row(code, month, strike, spot):
+    # HEADER_ROW の 17 列に合わせる
+    return [
+        code, "OOP", month, strike, "0", "0", "10", "10",
+        "120.5", "0.25", "80.5", spot, "0", "0", "0.25", "", ""
+    ]
+
+
+class _FakeResponse:
+    def __init__(self, status_code, body=b""):
+        self.status_code = status_code
+        self.raw = io.BytesIO(body)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def test_fetch_day_zip_then_read_day_zip(monkeypatch):
+    rows = [
+        _jpx_row("720318", " 202511 ", "3000", "3100.0"),
+        _jpx_row("720318", " 202511 ", "3250", "3100.0"),
+        _jpx_row("130118", "202511", "1000", "1000.0"),  # 対象外の銘柄
+    ]
+    zip_buf = io.BytesIO()
+    with zipfile.ZipFile(zip_buf, "w") as z:
+        z.writestr("ose20251020tp.csv", _jpx_csv_bytes(rows))
+
+    monkeypatch.setattr(
+        TargetBuyPBR._session, "get",
+        lambda url, **kwargs: _FakeResponse(200, zip_buf.getvalue())
+    )
+
+    trade_date = pd.Timestamp("2025-10-20")
+    zip_file, error = TargetBuyPBR.fetch_day_zip(trade_date)
+    assert error is None
+
+    df_day = TargetBuyPBR.read_day_zip(zip_file, trade_date)
+    assert zip_file.closed
+    assert df_day is not None
+    assert df_day["商品コード4桁"].astype(str).tolist() == ["7203", "7203"]
+    assert df_day["限月"].tolist() == ["202511", "202511"]
+    assert df_day["権利行使価格"].tolist() == [3000.0, 3250.0]
+
+
+@pytest.mark.filterwarnings("error")
+def test_read_jpx_csv_with_non_target_codes_does_not_warn():
+    rows = [
+        _jpx_row("720318", "202511", "3000", "3100.0"),
+        _jpx_row("130118", "202511", "1000", "1000.0"),  # 対象外の銘柄
+    ]
+    df = TargetBuyPBR.read_jpx_csv(io.BytesIO(_jpx_csv_bytes(rows)))
+    assert df["商品コード4桁"].astype(object).tolist()[0] == "7203"
+    assert df["商品コード4桁"].isna().tolist() == [False, True]
+
+    df = TargetBuyPBR.extract_target_rows(df)
+    assert df["商品コード4桁"].astype(str).tolist() == ["7203"]
+
+
+def test_blank_jpx_spot_falls_back_to_yfinance(monkeypatch):
+    rows = [
+        _jpx_row("720318", "202511", "2900", ""),
+        _jpx_row("720318", "202511", "3150", ""),
+    ]
+    df = TargetBuyPBR.extract_target_rows(
+        TargetBuyPBR.read_jpx_csv(io.BytesIO(_jpx_csv_bytes(rows)))
+    )
+
+    requested = []
+    def fake_prices(codes, trade_date):
+        requested.extend(codes)
+        return {code: 3000.0 for code in codes}
+    monkeypatch.setattr(TargetBuyPBR, "get_stock_prices_from_yf", fake_prices)
+
+    records = TargetBuyPBR.process_target_rows(df, "2025-10-20")
+    assert requested == ["7203"]
+    assert len(records) == 1
+    # 株価・コールスト・プットスト
+    assert records[0][2] == 3000.0
+    assert records[0][4] == 3150.0
+    assert records[0][8] == 2900.0
+
+
+def test_blank_jpx_spot_without_fallback_is_skipped(monkeypatch):
+    rows = [_jpx_row("720318", "202511", "3000", "")]
+    df = TargetBuyPBR.extract_target_rows(
+        TargetBuyPBR.read_jpx_csv(io.BytesIO(_jpx_csv_bytes(rows)))
+    )
+    monkeypatch.setattr(TargetBuyPBR, "get_stock_prices_from_yf", lambda codes, d: {})
+
+    assert TargetBuyPBR.process_target_rows(df, "2025-10-20") == []
+
+
+def test_fetch_day_zip_returns_none_on_http_error(monkeypatch):
+    monkeypatch.setattr(
+        TargetBuyPBR._session, "get", lambda url, **kwargs: _FakeResponse(404)
+    )
+    zip_file, error = TargetBuyPBR.fetch_day_zip(pd.Timestamp("2025-10-20"))
+    assert zip_file is None
+    assert "404" in error
+
+
+def test_failed_yfinance_download_is_not_cached(monkeypatch):
+    trade_date = pd.Timestamp("2025-10-20")
+    index = pd.DatetimeIndex(["2025-10-17", "2025-10-20"])
+    columns = pd.MultiIndex.from_tuples([("7203.T", "Close")])
+    results = [
+        pd.DataFrame(),  # 通信失敗時は例外ではなく空の表が返る
+        pd.DataFrame([[float("nan")], [float("nan")]], index=index, columns=columns),
+        pd.DataFrame([[2990.0], [3000.0]], index=index, columns=columns),
+    ]
+    calls = []
+    def fake_download(symbols, **kwargs):
+        calls.append(symbols)
+        return results[len(calls) - 1]
+    monkeypatch.setattr(TargetBuyPBR.yf, "download", fake_download)
+    monkeypatch.setattr(TargetBuyPBR, "_history_cache", {})
+
+    assert TargetBuyPBR.get_stock_prices_from_yf(["7203"], trade_date) == {}
+    assert TargetBuyPBR.get_stock_prices_from_yf(["7203"], trade_date) == {}
+    assert TargetBuyPBR.get_stock_prices_from_yf(["7203"], trade_date) == {"7203": 3000.0}
+    # 取得できた結果だけが再利用される
+    assert TargetBuyPBR.get_stock_prices_from_yf(["7203"], trade_date) == {"7203": 3000.0}
+    assert len(calls) == 3
+
+
+# 配列版と比べるための、1 銘柄ずつのブラックショールズと brentq による IV
+def _ref_bs_prices(S, K, T, r, sigma):
+    if sigma is None or S <= 0 or K <= 0 or T <= 0 or sigma <= 0:
+        return None, None
+    d1 = (log(S/K) + (r + 0.5*sigma**2)*T) / (sigma*sqrt(T))
+    d2 = d1 - sigma*sqrt(T)
+    call = S * norm.cdf(d1) - K * exp(-r*T) * norm.cdf(d2)
+    put  = K * exp(-r*T) * norm.cdf(-d2) - S * norm.cdf(-d1)
+    return call, put
+
+
+def _ref_implied_vol_put(S, K, T, r, market_price):
+    try:
+        return brentq(
+            lambda sigma: _ref_bs_prices(S, K, T, r, sigma)[1] - market_price,
+            0.0001, 3.0, xtol=1e-12
+        )
+    except Exception:
+        return None
+
+
+def _nan_if_none(values):
+    return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+
+
+@pytest.mark.parametrize("r", [TargetBuyPBR.R_DEFAULT, 0.01])
+def test_vectorized_black_scholes_matches_scalar_reference(r):
+    T = TargetBuyPBR.T_DEFAULT
+    S     = [3000.0, 3000.0, 1500.0, 0.0,    3000.0, 3000.0]
+    K     = [2900.0, 3150.0, 1500.0, 1000.0, -1.0,   3000.0]
+    sigma = [0.25,   0.40,   1.50,   0.25,   0.25,   None]
+
+    ref = [_ref_bs_prices(s_, k_, T, r, v) for s_, k_, v in zip(S, K, sigma)]
+    np.testing.assert_allclose(
+        TargetBuyPBR.bs_call_price_vec(S, K, T, r, sigma),
+        _nan_if_none([c for c, _ in ref]), rtol=1e-9, atol=1e-9
+    )
+    np.testing.assert_allclose(
+        TargetBuyPBR.bs_put_price_vec(S, K, T, r, sigma),
+        _nan_if_none([p for _, p in ref]), rtol=1e-9, atol=1e-9
+    )
+    # 株価・行使価格・sigma のどれかが不正なら NaN
+    assert np.isnan(TargetBuyPBR.bs_put_price_vec(S, K, T, r, sigma)[3:]).all()
+
+
+def test_vectorized_implied_vol_put_matches_brentq():
+    T, r = TargetBuyPBR.T_DEFAULT, TargetBuyPBR.R_DEFAULT
+    S      = [3000.0, 3000.0, 1500.0, 3000.0, 3000.0, 2000.0, 3000.0]
+    K      = [2900.0, 3150.0, 1500.0, 3000.0, 3000.0, 3000.0, 3000.0]
+    # 通常 3 件、プット価格 0 とマイナス、解なし（本質的価値未満・上限 sigma を超える価格）
+    prices = [40.0,   220.0,  180.0,  0.0,    -5.0,   900.0,  2900.0]
+
+    expected = _nan_if_none([
+        _ref_implied_vol_put(s_, k_, T, r, p) for s_, k_, p in zip(S, K, prices)
+    ])
+    assert np.isfinite(expected[:3]).all()
+    assert np.isnan(expected[3:]).all()
+
+    np.testing.assert_allclose(
+        TargetBuyPBR.implied_vol_put(S, K, T, r, prices), expected, rtol=1e-6
+    )
+
+
+@pytest.mark.parametrize("strikes, targets", [
+    # 等距離（2950 → 2900 と 3000 の中間）、範囲の下と上
+    ([2900.0, 3000.0, 3100.0], [2950.0, 3050.0, 2990.0, 1000.0, 5000.0]),
+    # 同じ行使価格が並んでいる場合は先頭
+    ([2900.0, 3000.0, 3000.0, 3000.0, 3100.0], [3000.0, 2950.0, 3050.0, 3040.0]),
+    # 行使価格が 1 つだけ
+    ([3000.0], [1000.0, 3000.0, 5000.0]),
+])
+def test_nearest_positions_matches_argmin(strikes, targets):
+    strikes = np.array(strikes)
+    expected = [int(np.abs(strikes - t).argmin()) for t in targets]
+    assert TargetBuyPBR.nearest_positions(strikes, targets).tolist() == expected
+
+
+def test_nearest_positions_tie_breaks():
+    strikes = np.array([2900.0, 3000.0, 3000.0, 3100.0])
+    # 等距離は小さい方、重複は先頭、範囲外は端
+    assert TargetBuyPBR.nearest_positions(strikes, [2950.0, 3050.0, 3000.0, 0.0, 9999.0]).tolist() \
+        == [0, 1, 1, 0, 3]